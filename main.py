@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 
 import os
+import gzip
+import json
+import asyncio
+import hashlib
 import argparse
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
 from dotenv import load_dotenv
 
-import praw
-import openai
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+# asyncpraw, asyncprawcore, openai and httpx are imported where they are
+# used so argument parsing (and --help) doesn't pay for them
 
 
 # -----------------------------------------------------------------------------
@@ -25,61 +31,213 @@ if not all([REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, OPENAI_API_KEY]):
         "Please set REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, and OPENAI_API_KEY in your .env"
     )
 
-# Configure the OpenAI API key
-openai.api_key = OPENAI_API_KEY
 MODEL_NAME = "gpt-3.5-turbo"  # or "gpt-4" if available
+MAX_CONCURRENCY = 5  # users processed at once (Reddit/OpenAI rate limits)
+CACHE_DIR = Path("openai_cache")  # completions keyed by prompt hash
+SNIPPET_BUDGET = 12_000  # max snippet characters sent to the model per user
+MIN_SNIPPET_CHARS = 20   # shorter items ("thanks!", "this") are noise
 
 # -----------------------------------------------------------------------------
-# 2. Initialize PRAW (Reddit client)
+# 2. Initialize API clients (Async PRAW + AsyncOpenAI)
 # -----------------------------------------------------------------------------
-reddit = praw.Reddit(
-    client_id=REDDIT_CLIENT_ID,
-    client_secret=REDDIT_CLIENT_SECRET,
-    user_agent="persona-builder/0.1"
+def make_reddit():
+    # asyncpraw must be created inside a running event loop
+    import asyncpraw
+    return asyncpraw.Reddit(
+        client_id=REDDIT_CLIENT_ID,
+        client_secret=REDDIT_CLIENT_SECRET,
+        user_agent="persona-builder/0.1",
+        timeout=16,
+    )
+
+def make_openai():
+    # one pooled HTTP/2 connection set shared by every persona request
+    import httpx
+    from openai import AsyncOpenAI
+    # max_retries=0: tenacity in _stream_chat is the only retry layer, so
+    # backoff isn't multiplied and quota errors fail fast
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        ),
+    )
+
+def _is_reddit_transient(e):
+    # 5xx, dropped connections, rate limiting
+    from asyncprawcore.exceptions import RequestException, ServerError, TooManyRequests
+    return isinstance(e, (RequestException, ServerError, TooManyRequests))
+
+# asyncprawcore already retries 5xx/connection errors a few times per
+# request, so this outer layer stays short: it mainly covers 429s
+_reddit_retry = retry(
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception(_is_reddit_transient),
+    reraise=True,
 )
 
 # -----------------------------------------------------------------------------
 # 3. Fetch posts & comments
 # -----------------------------------------------------------------------------
-def fetch_user_content(username: str, limit_posts: int = 100, limit_comments: int = 100):
-    posts, comments = [], []
+@_reddit_retry
+async def _collect_posts(redditor, limit):
+    # struct-of-arrays: (timestamps, kinds, snippets, permalinks); only the
+    # first 200 chars ever reach the prompt, so truncate at ingest
+    ts_arr, kind_arr, snip_arr, link_arr = [], [], [], []
+    async for post in redditor.submissions.new(limit=limit):
+        text = post.title + ("\n\n" + post.selftext[:200] if post.selftext else "")
+        ts_arr.append(post.created_utc)
+        kind_arr.append("Post")
+        snip_arr.append(text[:200].replace("\n", " ").strip())
+        link_arr.append(post.permalink)
+    return ts_arr, kind_arr, snip_arr, link_arr
+
+@_reddit_retry
+async def _collect_comments(redditor, limit):
+    ts_arr, kind_arr, snip_arr, link_arr = [], [], [], []
+    async for c in redditor.comments.new(limit=limit):
+        ts_arr.append(c.created_utc)
+        kind_arr.append("Comment")
+        snip_arr.append(c.body[:200].replace("\n", " ").strip())
+        link_arr.append(c.permalink)
+    return ts_arr, kind_arr, snip_arr, link_arr
+
+async def fetch_user_content(reddit, username: str, limit_posts: int = 100, limit_comments: int = 100):
     try:
-        redditor = reddit.redditor(username)
-        _ = redditor.id  # validate existence
-        for post in redditor.submissions.new(limit=limit_posts):
-            text = post.title + ("\n\n" + post.selftext if post.selftext else "")
-            posts.append((post.created_utc, "Post", text, post.permalink))
-        for c in redditor.comments.new(limit=limit_comments):
-            comments.append((c.created_utc, "Comment", c.body, c.permalink))
+        # no separate fetch=True round trip to validate the user: a missing or
+        # suspended account makes the listings themselves fail with 404/403.
+        # limit<=100 is one request per listing, and both run concurrently
+        redditor = await reddit.redditor(username)
+        posts, comments = await asyncio.gather(
+            _collect_posts(redditor, limit_posts),
+            _collect_comments(redditor, limit_comments),
+        )
     except Exception as e:
         print(f"[ERROR] fetching content for u/{username}: {e}")
         return None, None
     return posts, comments
 
+async def latest_activity(reddit, username: str):
+    """Newest created_utc across the user's posts and comments (two limit=1 calls)."""
+    redditor = await reddit.redditor(username)
+    posts, comments = await asyncio.gather(
+        _collect_posts(redditor, 1),
+        _collect_comments(redditor, 1),
+    )
+    return max(posts[0] + comments[0], default=None)
+
+# -----------------------------------------------------------------------------
+# 3b. Cached OpenAI ChatCompletion
+# -----------------------------------------------------------------------------
+def write_persona(out_file: Path, persona: str):
+    # personas are small, highly compressible markdown; keep them gzipped.
+    # Write a sibling .part file and swap it in, so a failure never leaves
+    # a truncated persona in place of the previous good one
+    tmp_file = out_file.with_name(out_file.name + ".part")
+    try:
+        with gzip.open(tmp_file, "wt", compresslevel=6, encoding="utf-8") as f:
+            f.write(persona)
+        os.replace(tmp_file, out_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+
+def _is_transient(e):
+    import openai
+    # quota errors are RateLimitErrors too, but waiting won't fix them
+    transient = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+    return isinstance(e, transient) and "quota" not in str(e).lower()
+
+@retry(
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception(_is_transient),
+    reraise=True,
+)
+async def _stream_chat(client, messages, temperature, max_tokens, tmp_file: Path):
+    stream = await client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+    # deltas go into the gzipped .part file as they arrive; flush() is a
+    # zlib sync flush, so each finished line is readable (zcat) mid-stream.
+    # A retry reopens with "wt" and starts the file over
+    buf = []
+    with gzip.open(tmp_file, "wt", compresslevel=6, encoding="utf-8") as f:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            f.write(delta)
+            buf.append(delta)
+            if "\n" in delta:
+                f.flush()
+    return "".join(buf)
+
+def _read_cache(cache_file: Path):
+    try:
+        return cache_file.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+def _write_cache(cache_file: Path, content: str):
+    # same .part + rename as write_persona: a killed run must not leave a
+    # half-written entry that every later run would read back as a hit
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_file = cache_file.with_name(cache_file.name + ".part")
+    try:
+        tmp_file.write_text(content, encoding="utf-8")
+        os.replace(tmp_file, cache_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+
+async def cached_chat(client, messages, out_file, temperature=0.5, max_tokens=1024, use_cache=True):
+    key = hashlib.sha256(json.dumps(
+        {"model": MODEL_NAME, "messages": messages, "t": temperature, "m": max_tokens},
+        sort_keys=True,
+    ).encode()).hexdigest()
+    cache_file = CACHE_DIR / f"{key}.txt"
+    content = await asyncio.to_thread(_read_cache, cache_file) if use_cache else None
+    if content is not None:
+        await asyncio.to_thread(write_persona, out_file, content)
+        return content
+
+    tmp_file = out_file.with_name(out_file.name + ".part")
+    try:
+        content = await _stream_chat(client, messages, temperature, max_tokens, tmp_file)
+        if not content.strip():
+            # an empty completion is a failure: don't overwrite the last persona
+            # or cache "" forever; callers treat "" as no result
+            return content
+        # same swap as write_persona: the previous persona stays until the
+        # stream has completed
+        os.replace(tmp_file, out_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+    await asyncio.to_thread(_write_cache, cache_file, content)
+    return content
+
 # -----------------------------------------------------------------------------
 # 4. Build persona via OpenAI
 # -----------------------------------------------------------------------------
-def build_persona(username: str, posts, comments) -> str:
-    def fmt(items):
-        lines = []
-        for ts, kind, txt, permalink in items:
-            date = datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d")
-            snippet = str(txt).replace("\n", " ").strip()[:200]
-            lines.append(
-                f"- ({kind} from {date}, https://www.reddit.com{permalink}) \"{snippet}…\""
-            )
-        return "\n".join(lines)
-
-    persona_prompt = f"""
-You are an expert user-research analyst. Your task is to analyze the provided Reddit posts and comments from the user u/{username} to build a detailed user persona.
+# Persona prompt, split around the two history blocks so each call is a
+# plain join instead of re-rendering one large f-string
+_HEAD = """You are an expert user-research analyst. Your task is to analyze the provided Reddit posts and comments from the user u/{username} to build a detailed user persona.
 
 **Reddit History for u/{username}:**
 
 --- POSTS ---
-{fmt(posts)}
+"""
+_MID = """
 
 --- COMMENTS ---
-{fmt(comments)}
+"""
+_TAIL = """
 
 **Analysis Task**:
 Based *only* on the provided text, create a user persona. The persona should be well-structured, insightful, and directly supported by evidence from the user's activity.
@@ -105,8 +263,50 @@ Based *only* on the provided text, create a user persona. The persona should be
 * **Values or Motivations:** What seems to be important to the user (e.g., community, learning, helping others, specific ideologies).
     * *Citation:* (Type of content, YYYY-MM-DD, URL)
 
-For each characteristic, you **must cite** one or two specific posts or comments as evidence, including the type, date, and the full permalink.
-""".strip()
+For each characteristic, you **must cite** one or two specific posts or comments as evidence, including the type, date, and the full permalink."""
+
+@lru_cache(maxsize=1024)
+def _ymd(day: int) -> str:
+    # items cluster on a few days, so memoize the date string per UTC day
+    return datetime.utcfromtimestamp(day * 86400).strftime("%Y-%m-%d")
+
+def trim_items(posts, comments, budget=SNIPPET_BUDGET):
+    """Newest-first, drop near-duplicates and one-liners, stop at the budget."""
+    seen, used = set(), 0
+    kept = {"Post": ([], [], [], []), "Comment": ([], [], [], [])}
+    rows = sorted((*zip(*posts), *zip(*comments)), key=lambda r: -r[0])
+    for row in rows:
+        snip = row[2]
+        key = snip[:80].lower()
+        if len(snip) < MIN_SNIPPET_CHARS or key in seen:
+            continue
+        if used + len(snip) > budget:
+            break
+        seen.add(key)
+        for arr, value in zip(kept[row[1]], row):
+            arr.append(value)
+        used += len(snip)
+    return kept["Post"], kept["Comment"]
+
+async def build_persona(client, username: str, posts, comments, out_file: Path, use_cache=True) -> str:
+    # one generator pass; _ymd bound as a default so it's a local
+    def fmt(items, _ymd=_ymd):
+        return "\n".join(
+            f"- ({kind} from {_ymd(int(ts) // 86400)}, https://www.reddit.com{permalink}) "
+            f"\"{snip}…\""
+            for ts, kind, snip, permalink in zip(*items)
+        )
+
+    untrimmed = len(fmt(posts)) + len(fmt(comments))
+    posts, comments = trim_items(posts, comments)
+    posts_block, comments_block = fmt(posts), fmt(comments)
+
+    persona_prompt = "".join((
+        _HEAD.format(username=username), posts_block, _MID, comments_block,
+        _TAIL.format(username=username),
+    ))
+    trimmed = untrimmed - len(posts_block) - len(comments_block)
+    print(f"[+] Prompt for u/{username}: {len(persona_prompt)} chars ({trimmed} trimmed from history)")
 
     messages = [
         {"role": "system", "content": "You are a helpful assistant specializing in user research and persona development."},
@@ -114,13 +314,10 @@ For each characteristic, you **must cite** one or two specific posts or comments
     ]
 
     try:
-        resp = openai.ChatCompletion.create(
-            model=MODEL_NAME,
-            messages=messages,
-            temperature=0.5,
-            max_tokens=1024,
+        persona = await cached_chat(
+            client, messages, out_file, temperature=0.5, max_tokens=1024, use_cache=use_cache
         )
-        return resp.choices[0].message.content.strip()
+        return persona.strip()
     except Exception as e:
         print(f"[ERROR] generating persona: {e}")
         return None
@@ -128,40 +325,103 @@ For each characteristic, you **must cite** one or two specific posts or comments
 # -----------------------------------------------------------------------------
 # 5. Main entrypoint
 # -----------------------------------------------------------------------------
+def _load_max_ts(meta_file: Path):
+    try:
+        return json.loads(meta_file.read_text(encoding="utf-8"))["max_ts"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _save_max_ts(meta_file: Path, max_ts: float):
+    meta_file.write_text(json.dumps({"max_ts": max_ts}), encoding="utf-8")
+
+async def is_unchanged(reddit, username: str, out_file: Path, meta_file: Path) -> bool:
+    # persona on disk and nothing posted since it was built -> skip the full run
+    if not out_file.exists():
+        return False
+    max_ts = await asyncio.to_thread(_load_max_ts, meta_file)
+    if max_ts is None:
+        return False
+    try:
+        latest = await latest_activity(reddit, username)
+    except Exception:
+        return False
+    return latest is not None and latest <= max_ts
+
+async def process_user(reddit, client, username: str, sem: asyncio.Semaphore, use_cache=True):
+    async with sem:
+        out_dir = Path("outputs")
+        out_file = out_dir / f"{username}_persona.txt.gz"
+        meta_file = out_dir / f"{username}_persona.meta.json"
+        if use_cache and await is_unchanged(reddit, username, out_file, meta_file):
+            print(f"[=] No new activity for u/{username}; keeping {out_file}")
+            return
+
+        print(f"[+] Fetching content for u/{username}…")
+        posts, comments = await fetch_user_content(reddit, username)
+
+        if posts is None or comments is None:
+            return
+
+        print(f"[+] Fetched {len(posts[0])} posts and {len(comments[0])} comments for u/{username}.")
+        if not posts[0] and not comments[0]:
+            print(f"[!] No content found for u/{username}; skipping.")
+            return
+
+        await asyncio.to_thread(out_dir.mkdir, exist_ok=True)
+
+        print(f"[+] Generating persona for u/{username} with OpenAI ChatCompletion…")
+        persona = await build_persona(client, username, posts, comments, out_file, use_cache)
+        if not persona:
+            print(f"[!] Persona generation for u/{username} returned empty; skipping.")
+            return
+
+        await asyncio.to_thread(_save_max_ts, meta_file, max(posts[0] + comments[0]))
+        print(f"[✔] Wrote {len(persona)} characters to {out_file.resolve()}")
+
+async def main_async(usernames, use_cache=True):
+    # one Reddit and one OpenAI client (auth + keep-alive pools) shared by every user
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with make_reddit() as reddit, make_openai() as client:
+        results = await asyncio.gather(
+            *(process_user(reddit, client, u, sem, use_cache) for u in usernames),
+            return_exceptions=True,  # one failing user must not cancel the rest
+        )
+    for username, result in zip(usernames, results):
+        if isinstance(result, Exception):
+            print(f"[ERROR] processing u/{username}: {result}")
+
 def main():
     parser = argparse.ArgumentParser(
-        description="Build a Reddit user persona using their posts and comments."
+        description="Build Reddit user personas using their posts and comments."
     )
-    parser.add_argument("url", help="Full Reddit user profile URL.")
+    parser.add_argument("url", nargs="*", help="One or more full Reddit user profile URLs.")
+    parser.add_argument("--input", type=Path, help="File with one Reddit user profile URL per line.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Rebuild even without new activity, and skip the completion cache.")
     args = parser.parse_args()
 
-    if "reddit.com/user/" not in args.url:
-        print("[ERROR] Please provide a valid Reddit user profile URL.")
-        return
-
-    username = args.url.rstrip("/").split("/")[-1]
-    print(f"[+] Fetching content for u/{username}…")
-    posts, comments = fetch_user_content(username)
-
-    if posts is None or comments is None:
-        return
-
-    print(f"[+] Fetched {len(posts)} posts and {len(comments)} comments.")
-    if not posts and not comments:
-        print(f"[!] No content found for u/{username}; exiting.")
-        return
-
-    print("[+] Generating persona with OpenAI ChatCompletion…")
-    persona = build_persona(username, posts, comments)
-    if not persona:
-        print("[!] Persona generation returned empty; exiting.")
+    urls = list(args.url)
+    if args.input:
+        try:
+            lines = args.input.read_text(encoding="utf-8").splitlines()
+        except OSError as e:
+            parser.error(f"cannot read --input file: {e}")
+        urls += [line.strip() for line in lines if line.strip()]
+    if not urls:
+        parser.error("provide at least one profile URL or --input")
+
+    usernames = []
+    for url in urls:
+        if "reddit.com/user/" not in url:
+            print(f"[ERROR] Not a valid Reddit user profile URL: {url}")
+            continue
+        usernames.append(url.rstrip("/").split("/")[-1])
+    # a repeated user would run two pipelines writing the same output files
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
         return
 
-    out_dir = Path("outputs")
-    out_dir.mkdir(exist_ok=True)
-    out_file = out_dir / f"{username}_persona.txt"
-    out_file.write_text(persona, encoding="utf-8")
-    print(f"[✔] Wrote {len(persona)} characters to {out_file.resolve()}")
+    asyncio.run(main_async(usernames, use_cache=not args.no_cache))
 
 if __name__ == "__main__":
     main()
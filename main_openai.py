@@ -1,15 +1,24 @@
 #!/usr/bin/env python3
 
 import os
+import gzip
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
 import argparse
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+from contextlib import closing
 from dotenv import load_dotenv
 
-import praw
-import openai
-from textblob import TextBlob
-from collections import Counter
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+# asyncpraw, openai, httpx, numpy and textblob are imported where they are
+# used so argument parsing (and --help) doesn't pay for them
 
 # --------------------------------------------------------------------------
 # 1. Load configuration
@@ -25,58 +34,320 @@ if not all([REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, OPENAI_API_KEY]):
         "Please set REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, and OPENAI_API_KEY in your .env"
     )
 
-openai.api_key = OPENAI_API_KEY
 MODEL_NAME = "gpt-3.5-turbo"  # switch to "gpt-4" if you have access
+MAX_CONCURRENCY = 5  # users processed at once (Reddit/OpenAI rate limits)
+CACHE_DIR = Path("openai_cache")  # completions keyed by prompt hash
+SNIPPET_BUDGET = 12_000  # max snippet characters sent to the model per user
+MIN_SNIPPET_CHARS = 20   # shorter items ("thanks!", "this") are noise
+SEMANTIC_DB = CACHE_DIR / "semantic_personas.sqlite3"  # rows keyed by username
+EMBED_MODEL = "all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = 0.97  # min cosine similarity to reuse a stored persona
+SEMANTIC_TTL = 7 * 24 * 3600  # seconds before a stored persona goes stale
+EMBED_CHUNK_CHARS = 800  # ~200 word pieces, under MiniLM's 256 limit
+
+# Fallback builder tokenization: one regex pass instead of NLTK punkt
+_WORD_RE = re.compile(r"[A-Za-z]+(?:['’][A-Za-z]+)?")  # keeps "don't" whole
+_SENT_RE = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = frozenset({
+    'the','and','is','in','to','of','a','for','on','it','with','this',
+    'that','i','you','as','was','are','but','they','be','or','not'
+})
 
 # --------------------------------------------------------------------------
-# 2. Initialize PRAW (Reddit client)
+# 2. Initialize API clients (Async PRAW + AsyncOpenAI)
 # --------------------------------------------------------------------------
-reddit = praw.Reddit(
-    client_id=REDDIT_CLIENT_ID,
-    client_secret=REDDIT_CLIENT_SECRET,
-    user_agent="persona-builder/0.1"
+def make_reddit():
+    # asyncpraw must be created inside a running event loop
+    import asyncpraw
+    return asyncpraw.Reddit(
+        client_id=REDDIT_CLIENT_ID,
+        client_secret=REDDIT_CLIENT_SECRET,
+        user_agent="persona-builder/0.1",
+        timeout=16,
+    )
+
+def make_openai():
+    # one pooled HTTP/2 connection set shared by every persona request
+    import httpx
+    from openai import AsyncOpenAI
+    # max_retries=0: tenacity in _stream_chat is the only retry layer, so
+    # backoff isn't multiplied and quota errors fail fast
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        ),
+    )
+
+def _is_reddit_transient(e):
+    # 5xx, dropped connections, rate limiting
+    from asyncprawcore.exceptions import RequestException, ServerError, TooManyRequests
+    return isinstance(e, (RequestException, ServerError, TooManyRequests))
+
+# asyncprawcore already retries 5xx/connection errors a few times per
+# request, so this outer layer stays short: it mainly covers 429s
+_reddit_retry = retry(
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception(_is_reddit_transient),
+    reraise=True,
 )
 
 # --------------------------------------------------------------------------
 # 3. Fetch posts & comments
 # --------------------------------------------------------------------------
-def fetch_user_content(username: str, limit_posts=100, limit_comments=100):
-    posts, comments = [], []
+@_reddit_retry
+async def _collect_posts(redditor, limit):
+    # struct-of-arrays: (timestamps, kinds, texts, permalinks); texts are kept
+    # whole because the TextBlob fallback analyses full bodies, and the prompt
+    # side cuts them to 200 chars
+    ts_arr, kind_arr, text_arr, link_arr = [], [], [], []
+    async for post in redditor.submissions.new(limit=limit):
+        text = post.title + ("\n\n" + post.selftext if post.selftext else "")
+        ts_arr.append(post.created_utc)
+        kind_arr.append("Post")
+        text_arr.append(text.replace("\n", " ").strip())
+        link_arr.append(post.permalink)
+    return ts_arr, kind_arr, text_arr, link_arr
+
+@_reddit_retry
+async def _collect_comments(redditor, limit):
+    ts_arr, kind_arr, text_arr, link_arr = [], [], [], []
+    async for c in redditor.comments.new(limit=limit):
+        ts_arr.append(c.created_utc)
+        kind_arr.append("Comment")
+        text_arr.append(c.body.replace("\n", " ").strip())
+        link_arr.append(c.permalink)
+    return ts_arr, kind_arr, text_arr, link_arr
+
+async def fetch_user_content(reddit, username: str, limit_posts=100, limit_comments=100):
     try:
-        redditor = reddit.redditor(username)
-        _ = redditor.id  # validate existence
-        for post in redditor.submissions.new(limit=limit_posts):
-            text = post.title + ("\n\n" + post.selftext if post.selftext else "")
-            posts.append((post.created_utc, "Post", text, post.permalink))
-        for c in redditor.comments.new(limit=limit_comments):
-            comments.append((c.created_utc, "Comment", c.body, c.permalink))
+        # no separate fetch=True round trip to validate the user: a missing or
+        # suspended account makes the listings themselves fail with 404/403.
+        # limit<=100 is one request per listing, and both run concurrently
+        redditor = await reddit.redditor(username)
+        posts, comments = await asyncio.gather(
+            _collect_posts(redditor, limit_posts),
+            _collect_comments(redditor, limit_comments),
+        )
     except Exception as e:
         print(f"[ERROR] fetching content for u/{username}: {e}")
         return None, None
     return posts, comments
 
+async def latest_activity(reddit, username: str):
+    """Newest created_utc across the user's posts and comments (two limit=1 calls)."""
+    redditor = await reddit.redditor(username)
+    posts, comments = await asyncio.gather(
+        _collect_posts(redditor, 1),
+        _collect_comments(redditor, 1),
+    )
+    return max(posts[0] + comments[0], default=None)
+
 # --------------------------------------------------------------------------
-# 4a. Build persona via OpenAI LLM
+# 3b. Cached OpenAI ChatCompletion
+# --------------------------------------------------------------------------
+def write_persona(out_file: Path, persona: str):
+    # personas are small, highly compressible markdown; keep them gzipped.
+    # Write a sibling .part file and swap it in, so a failure never leaves
+    # a truncated persona in place of the previous good one
+    tmp_file = out_file.with_name(out_file.name + ".part")
+    try:
+        with gzip.open(tmp_file, "wt", compresslevel=6, encoding="utf-8") as f:
+            f.write(persona)
+        os.replace(tmp_file, out_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+
+def _is_transient(e):
+    import openai
+    # quota errors are RateLimitErrors too, but waiting won't fix them
+    transient = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+    return isinstance(e, transient) and "quota" not in str(e).lower()
+
+@retry(
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception(_is_transient),
+    reraise=True,
+)
+async def _stream_chat(client, messages, temperature, max_tokens, tmp_file: Path):
+    stream = await client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+    # deltas go into the gzipped .part file as they arrive; flush() is a
+    # zlib sync flush, so each finished line is readable (zcat) mid-stream.
+    # A retry reopens with "wt" and starts the file over
+    buf = []
+    with gzip.open(tmp_file, "wt", compresslevel=6, encoding="utf-8") as f:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            f.write(delta)
+            buf.append(delta)
+            if "\n" in delta:
+                f.flush()
+    return "".join(buf)
+
+def _read_cache(cache_file: Path):
+    try:
+        return cache_file.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+def _write_cache(cache_file: Path, content: str):
+    # same .part + rename as write_persona: a killed run must not leave a
+    # half-written entry that every later run would read back as a hit
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_file = cache_file.with_name(cache_file.name + ".part")
+    try:
+        tmp_file.write_text(content, encoding="utf-8")
+        os.replace(tmp_file, cache_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+
+def _cache_file(messages, temperature, max_tokens) -> Path:
+    key = hashlib.sha256(json.dumps(
+        {"model": MODEL_NAME, "messages": messages, "t": temperature, "m": max_tokens},
+        sort_keys=True,
+    ).encode()).hexdigest()
+    return CACHE_DIR / f"{key}.txt"
+
+async def exact_cache_hit(messages, out_file, temperature=0.5, max_tokens=1024):
+    content = await asyncio.to_thread(_read_cache, _cache_file(messages, temperature, max_tokens))
+    if content is not None:
+        await asyncio.to_thread(write_persona, out_file, content)
+    return content
+
+async def cached_chat(client, messages, out_file, temperature=0.5, max_tokens=1024,
+                      use_cache=True, read_cache=True):
+    # read_cache=False when the caller already tried exact_cache_hit()
+    cache_file = _cache_file(messages, temperature, max_tokens)
+    if use_cache and read_cache:
+        content = await exact_cache_hit(messages, out_file, temperature, max_tokens)
+        if content is not None:
+            return content
+
+    tmp_file = out_file.with_name(out_file.name + ".part")
+    try:
+        content = await _stream_chat(client, messages, temperature, max_tokens, tmp_file)
+        if not content.strip():
+            # an empty completion is a failure: don't overwrite the last persona
+            # or cache "" forever; callers treat "" as no result
+            return content
+        # same swap as write_persona: the previous persona stays until the
+        # stream has completed
+        os.replace(tmp_file, out_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+    if use_cache:
+        await asyncio.to_thread(_write_cache, cache_file, content)
+    return content
+
+# --------------------------------------------------------------------------
+# 3c. Semantic persona cache (local embeddings + SQLite)
 # --------------------------------------------------------------------------
-def build_persona_llm(username, posts, comments):
-    def fmt(items):
-        out = []
-        for ts, kind, txt, permalink in items:
-            date = datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d")
-            snippet = txt.replace("\n", " ").strip()[:200]
-            out.append(f"- ({kind} from {date}, https://www.reddit.com{permalink}) “{snippet}…”")
-        return "\n".join(out)
+_EMBEDDER_LOCK = threading.Lock()
 
-    prompt = f"""
-You are an expert user-research analyst. Your task is to analyze the provided Reddit posts and comments from the user u/{username} to build a detailed user persona.
+def _embedder():
+    # lookups run in worker threads; serialize the first load so torch and
+    # the model download happen once, not once per concurrent user
+    with _EMBEDDER_LOCK:
+        return _load_embedder()
+
+@lru_cache(maxsize=1)
+def _load_embedder():
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("[!] sentence-transformers not installed; semantic cache disabled.")
+        return None
+    return SentenceTransformer(EMBED_MODEL)
+
+def _semantic_db():
+    # callers use `closing(...) as db, db` so the transaction commits and the
+    # connection is closed; a bare `with connection` never closes it
+    CACHE_DIR.mkdir(exist_ok=True)
+    db = sqlite3.connect(SEMANTIC_DB)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS personas (username TEXT NOT NULL, "
+        "embedding BLOB NOT NULL, persona TEXT NOT NULL, created REAL NOT NULL)"
+    )
+    return db
+
+def _chunks(snippets, size=EMBED_CHUNK_CHARS):
+    # MiniLM truncates at 256 word pieces, so embed the history in pieces
+    chunk, used = [], 0
+    for snip in snippets:
+        if chunk and used + len(snip) > size:
+            yield " ".join(chunk)
+            chunk, used = [], 0
+        chunk.append(snip)
+        used += len(snip) + 1
+    if chunk:
+        yield " ".join(chunk)
+
+def _embed(snippets):
+    import numpy as np
+    model = _embedder()
+    if model is None:
+        return None
+    chunks = list(_chunks(snippets))
+    if not chunks:
+        return None
+    vec = model.encode(chunks, normalize_embeddings=True).mean(axis=0)
+    return (vec / np.linalg.norm(vec)).astype(np.float32)
+
+def semantic_lookup(username, snippets, threshold=SEMANTIC_THRESHOLD):
+    """Return (stored persona or None, query embedding or None) for this user's history."""
+    import numpy as np
+    q = _embed(snippets)
+    if q is None:
+        return None, None
+    with closing(_semantic_db()) as db, db:
+        db.execute("DELETE FROM personas WHERE created < ?", (time.time() - SEMANTIC_TTL,))
+        rows = db.execute(
+            "SELECT embedding, persona FROM personas WHERE username = ?", (username,)
+        ).fetchall()
+    if not rows:
+        return None, q
+    vecs = np.stack([np.frombuffer(blob, dtype=np.float32) for blob, _ in rows])
+    scores = vecs @ q  # embeddings are normalized, so dot == cosine
+    best = int(np.argmax(scores))
+    if scores[best] >= threshold:
+        return rows[best][1], q
+    return None, q
+
+def semantic_store(username, embedding, persona):
+    with closing(_semantic_db()) as db, db:
+        db.execute(
+            "INSERT INTO personas (username, embedding, persona, created) VALUES (?, ?, ?, ?)",
+            (username, embedding.tobytes(), persona, time.time()),
+        )
+
+# --------------------------------------------------------------------------
+# 4a. Build persona via OpenAI LLM
+# --------------------------------------------------------------------------
+# Persona prompt, split around the two history blocks so each call is a
+# plain join instead of re-rendering one large f-string
+_HEAD = """You are an expert user-research analyst. Your task is to analyze the provided Reddit posts and comments from the user u/{username} to build a detailed user persona.
 
 **Reddit History for u/{username}:**
 
 --- POSTS ---
-{fmt(posts)}
+"""
+_MID = """
 
 --- COMMENTS ---
-{fmt(comments)}
+"""
+_TAIL = """
 
 **Analysis Task**:
 Based *only* on the provided text, create a user persona. The persona should be well-structured, insightful, and directly supported by evidence from the user's activity.
@@ -102,45 +373,127 @@ Based *only* on the provided text, create a user persona. The persona should be
 * **Values or Motivations:** What seems to be important to the user (e.g., community, learning, helping others, specific ideologies).
     * *Citation:* (Type of content, YYYY-MM-DD, URL)
 
-For each characteristic, you **must cite** one or two specific posts or comments as evidence, including the type, date, and the full permalink.
-""".strip()
+For each characteristic, you **must cite** one or two specific posts or comments as evidence, including the type, date, and the full permalink."""
+
+@lru_cache(maxsize=1024)
+def _ymd(day: int) -> str:
+    # items cluster on a few days, so memoize the date string per UTC day
+    return datetime.utcfromtimestamp(day * 86400).strftime("%Y-%m-%d")
+
+def trim_items(posts, comments, budget=SNIPPET_BUDGET):
+    """Newest-first, drop near-duplicates and one-liners, stop at the budget."""
+    seen, used = set(), 0
+    kept = {"Post": ([], [], [], []), "Comment": ([], [], [], [])}
+    rows = sorted((*zip(*posts), *zip(*comments)), key=lambda r: -r[0])
+    for row in rows:
+        text = row[2]
+        key = text[:80].lower()
+        if len(text) < MIN_SNIPPET_CHARS or key in seen:
+            continue
+        size = min(len(text), 200)  # fmt() never sends more than 200 chars
+        if used + size > budget:
+            break
+        seen.add(key)
+        for arr, value in zip(kept[row[1]], row):
+            arr.append(value)
+        used += size
+    return kept["Post"], kept["Comment"]
+
+async def build_persona_llm(client, username, posts, comments, out_file, use_cache=True, threshold=SEMANTIC_THRESHOLD):
+    """Return (persona or None, fresh); fresh is False for a semantic-cache hit."""
+    # one generator pass; _ymd bound as a default so it's a local
+    def fmt(items, _ymd=_ymd):
+        return "\n".join(
+            f"- ({kind} from {_ymd(int(ts) // 86400)}, https://www.reddit.com{permalink}) "
+            f"“{text[:200]}…”"
+            for ts, kind, text, permalink in zip(*items)
+        )
+
+    untrimmed = len(fmt(posts)) + len(fmt(comments))
+    posts, comments = trim_items(posts, comments)
+    posts_block, comments_block = fmt(posts), fmt(comments)
+
+    prompt = "".join((
+        _HEAD.format(username=username), posts_block, _MID, comments_block,
+        _TAIL.format(username=username),
+    ))
+    trimmed = untrimmed - len(posts_block) - len(comments_block)
+    print(f"[+] Prompt for u/{username}: {len(prompt)} chars ({trimmed} trimmed from history)")
+
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant specializing in user research and persona development."},
+        {"role": "user", "content": prompt}
+    ]
+
+    embedding = None
+    if use_cache:
+        # an identical prompt is one file read away; only embed on a miss
+        content = await exact_cache_hit(messages, out_file, temperature=0.5, max_tokens=1024)
+        if content is not None:
+            return content.strip(), True
+
+        # embedding is CPU-bound, so keep it off the event loop; embed only
+        # the user's history, not the fixed template around it
+        try:
+            hit, embedding = await asyncio.to_thread(
+                semantic_lookup, username, [t[:200] for t in posts[2] + comments[2]], threshold
+            )
+        except Exception as e:
+            # a cache problem (model download, sqlite) is just a miss
+            print(f"[!] Semantic cache lookup failed for u/{username}: {e}")
+            hit, embedding = None, None
+        if hit:
+            print(f"[+] Reusing a near-identical cached persona for u/{username}.")
+            await asyncio.to_thread(write_persona, out_file, hit)
+            return hit, False
 
     try:
-        resp = openai.ChatCompletion.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant specializing in user research and persona development."},
-                {"role": "user", "content": prompt}
-            ],
+        persona = (await cached_chat(
+            client,
+            messages,
+            out_file,
             temperature=0.5,
             max_tokens=1024,
-        )
-        return resp.choices[0].message.content.strip()
+            use_cache=use_cache,
+            read_cache=False,
+        )).strip()
     except Exception as e:
         err = str(e).lower()
         if "quota" in err:
             print("[ERROR] OpenAI quota exceeded.")
         else:
             print(f"[ERROR] generating persona: {e}")
-        return None
+        return None, False
+
+    if not persona:
+        return None, False
+    if embedding is not None:
+        try:
+            await asyncio.to_thread(semantic_store, username, embedding, persona)
+        except Exception as e:
+            print(f"[!] Could not store u/{username} in the semantic cache: {e}")
+    return persona, True
 
 # --------------------------------------------------------------------------
 # 4b. Fallback: simple persona builder (TextBlob + word frequency)
 # --------------------------------------------------------------------------
 def build_persona_simple(posts, comments):
-    combined = " ".join([text for _, _, text, _ in posts + comments])
-    blob = TextBlob(combined)
-
-    # Simple stopword list
-    stopwords = {
-        'the','and','is','in','to','of','a','for','on','it','with','this',
-        'that','i','you','as','was','are','but','they','be','or','not'
-    }
-    words = [w.lower() for w in blob.words if w.isalpha() and w.lower() not in stopwords]
-    freq = Counter(words)
-    top = freq.most_common(5)
-
-    sentiment = blob.sentiment
+    import numpy as np
+    from textblob import TextBlob
+    combined = " ".join(posts[2] + comments[2])
+    # _WORD_RE yields ASCII words, possibly contractions; like TextBlob's
+    # isalpha() filter, contractions ("don't", "it's") aren't counted as topics
+    words = [w for w in _WORD_RE.findall(combined.lower()) if w.isalpha() and w not in _STOPWORDS]
+    top = []
+    if words:
+        # count with one C-level sort instead of a Python dict update per token
+        uniq, counts = np.unique(np.array(words), return_counts=True)
+        k = min(5, len(uniq))
+        idx = np.argpartition(-counts, k - 1)[:k]
+        idx = idx[np.argsort(-counts[idx], kind="stable")]
+        top = [(str(uniq[i]), int(counts[i])) for i in idx]
+
+    sentiment = TextBlob(combined).sentiment
     lines = []
 
     # Summary
@@ -158,7 +511,8 @@ def build_persona_simple(posts, comments):
         lines.append(f"- {topic} (mentioned {count} times)")
 
     # Communication Style & Tone
-    avg_len = sum(len(s.words) for s in blob.sentences) / len(blob.sentences) if blob.sentences else 0
+    sent_lens = [len(_WORD_RE.findall(s)) for s in _SENT_RE.split(combined) if s]
+    avg_len = sum(sent_lens) / len(sent_lens) if sent_lens else 0
     lines.append("\n**Communication Style & Tone:**")
     lines.append(f"- Sentiment polarity: {sentiment.polarity:.2f}, subjectivity: {sentiment.subjectivity:.2f}")
     lines.append(f"- Average sentence length: {avg_len:.1f} words\n")
@@ -168,37 +522,110 @@ def build_persona_simple(posts, comments):
 # --------------------------------------------------------------------------
 # 5. Main entrypoint
 # --------------------------------------------------------------------------
+def _load_max_ts(meta_file: Path):
+    try:
+        return json.loads(meta_file.read_text(encoding="utf-8"))["max_ts"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _save_max_ts(meta_file: Path, max_ts: float):
+    meta_file.write_text(json.dumps({"max_ts": max_ts}), encoding="utf-8")
+
+async def is_unchanged(reddit, username: str, out_file: Path, meta_file: Path) -> bool:
+    # persona on disk and nothing posted since it was built -> skip the full run
+    if not out_file.exists():
+        return False
+    max_ts = await asyncio.to_thread(_load_max_ts, meta_file)
+    if max_ts is None:
+        return False
+    try:
+        latest = await latest_activity(reddit, username)
+    except Exception:
+        return False
+    return latest is not None and latest <= max_ts
+
+async def process_user(reddit, client, username, sem, use_cache=True, threshold=SEMANTIC_THRESHOLD):
+    async with sem:
+        out_dir = Path("outputs")
+        out_file = out_dir / f"{username}_persona.txt.gz"
+        meta_file = out_dir / f"{username}_persona.meta.json"
+        if use_cache and await is_unchanged(reddit, username, out_file, meta_file):
+            print(f"[=] No new activity for u/{username}; keeping {out_file}")
+            return
+
+        print(f"[+] Fetching content for u/{username}…")
+        posts, comments = await fetch_user_content(reddit, username)
+        if posts is None or (not posts[0] and not comments[0]):
+            print(f"[ERROR] No posts or comments found for u/{username}; skipping.")
+            return
+
+        await asyncio.to_thread(out_dir.mkdir, exist_ok=True)
+
+        # Attempt LLM first (writes out_file once the stream completes)
+        print(f"[+] Trying OpenAI persona generation for u/{username}…")
+        persona, fresh = await build_persona_llm(
+            client, username, posts, comments, out_file, use_cache, threshold
+        )
+
+        # Fallback if needed; only a freshly generated LLM persona is recorded
+        # as up to date, so fallbacks and semantic-cache reuse get rechecked
+        if persona:
+            if fresh:
+                await asyncio.to_thread(_save_max_ts, meta_file, max(posts[0] + comments[0]))
+            else:
+                await asyncio.to_thread(meta_file.unlink, missing_ok=True)
+        else:
+            print(f"[+] Falling back to simple persona builder for u/{username}…")
+            # TextBlob + numpy are CPU-bound; keep the loop serving other users
+            persona = await asyncio.to_thread(build_persona_simple, posts, comments)
+            await asyncio.to_thread(write_persona, out_file, persona)
+            await asyncio.to_thread(meta_file.unlink, missing_ok=True)
+
+        print(f"[✔] Persona written to {out_file.resolve()}")
+
+async def main_async(usernames, use_cache=True, threshold=SEMANTIC_THRESHOLD):
+    # one Reddit and one OpenAI client (auth + keep-alive pools) shared by every user
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with make_reddit() as reddit, make_openai() as client:
+        results = await asyncio.gather(
+            *(process_user(reddit, client, u, sem, use_cache, threshold) for u in usernames),
+            return_exceptions=True,  # one failing user must not cancel the rest
+        )
+    for username, result in zip(usernames, results):
+        if isinstance(result, Exception):
+            print(f"[ERROR] processing u/{username}: {result}")
+
 def main():
-    parser = argparse.ArgumentParser(description="Build a Reddit user persona.")
-    parser.add_argument("url", help="Full Reddit user profile URL (e.g. https://www.reddit.com/user/kojied/)")
+    parser = argparse.ArgumentParser(description="Build Reddit user personas.")
+    parser.add_argument("url", nargs="*", help="One or more full Reddit user profile URLs (e.g. https://www.reddit.com/user/kojied/)")
+    parser.add_argument("--input", type=Path, help="File with one Reddit user profile URL per line.")
+    parser.add_argument("--no-cache", action="store_true", help="Skip the persona caches and always call OpenAI.")
+    parser.add_argument("--cache-threshold", type=float, default=SEMANTIC_THRESHOLD,
+                        help=f"Cosine similarity needed to reuse a cached persona (default {SEMANTIC_THRESHOLD}).")
     args = parser.parse_args()
 
-    if "reddit.com/user/" not in args.url:
-        print("[ERROR] Please provide a valid Reddit user profile URL.")
-        return
-
-    username = args.url.rstrip("/").split("/")[-1]
-    print(f"[+] Fetching content for u/{username}…")
-    posts, comments = fetch_user_content(username)
-    if not posts and not comments:
-        print("[ERROR] No posts or comments found; exiting.")
+    urls = list(args.url)
+    if args.input:
+        try:
+            lines = args.input.read_text(encoding="utf-8").splitlines()
+        except OSError as e:
+            parser.error(f"cannot read --input file: {e}")
+        urls += [line.strip() for line in lines if line.strip()]
+    if not urls:
+        parser.error("provide at least one profile URL or --input")
+
+    usernames = []
+    for url in urls:
+        if "reddit.com/user/" not in url:
+            print(f"[ERROR] Not a valid Reddit user profile URL: {url}")
+            continue
+        usernames.append(url.rstrip("/").split("/")[-1])
+    # a repeated user would run two pipelines writing the same output files
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
         return
 
-    # Attempt LLM first
-    print("[+] Trying OpenAI persona generation…")
-    persona = build_persona_llm(username, posts, comments)
-
-    # Fallback if needed
-    if not persona:
-        print("[+] Falling back to simple persona builder…")
-        persona = build_persona_simple(posts, comments)
-
-    # Write out
-    out_dir = Path("outputs")
-    out_dir.mkdir(exist_ok=True)
-    out_file = out_dir / f"{username}_persona.txt"
-    out_file.write_text(persona, encoding="utf-8")
-    print(f"[✔] Persona written to {out_file.resolve()}")
+    asyncio.run(main_async(usernames, not args.no_cache, args.cache_threshold))
 
 if __name__ == "__main__":
     main()